@@ -0,0 +1,23 @@
+"""JSON encoding and decoding with orjson when it is installed."""
+
+from typing import Any, Callable, Optional
+
+try:
+    import orjson as json_lib
+except ImportError:  # orjson is optional; fall back to the stdlib
+    import json as json_lib
+
+# Accepts str or bytes with either backend
+loads = json_lib.loads
+
+
+def dumps_str(obj: Any, default: Optional[Callable[[Any], Any]] = None) -> str:
+    """Serialize to a JSON string (orjson returns bytes)."""
+    data = json_lib.dumps(obj, default=default)
+    return data.decode() if isinstance(data, bytes) else data
+
+
+def dumps_bytes(obj: Any, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    """Serialize to UTF-8 JSON bytes (the stdlib returns str)."""
+    data = json_lib.dumps(obj, default=default)
+    return data.encode() if isinstance(data, str) else data
@@ -3,24 +3,48 @@ Structured logging configuration for MediaWarn NLP service.
 Implements industry-standard structured logging with JSON format.
 """
 
+import asyncio
 import logging
 import os
 import sys
+import threading
 import time
 from typing import Any, Dict, Optional
 
 import structlog
 from pythonjsonlogger import jsonlogger
 
+from app.jsonutil import dumps_bytes
+
+SERVICE_NAME = "mediawarn-nlp"
+SERVICE_VERSION = os.getenv("APP_VERSION", "dev")
+
+# Minimum level for the direct writer, set by setup_logging()
+_min_level = logging.INFO
+
+# Request-path records are queued here and written in batches by
+# run_log_flusher(); records are dropped (and counted) when it is full.
+# asyncio.Queue isn't thread-safe, so only the flusher's event loop thread
+# (None while no flusher runs) queues records.
+_log_queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(maxsize=10_000)
+_flusher_thread: Optional[int] = None
+_dropped_records = 0
+
+# (epoch second, "YYYY-MM-DDTHH:MM:SS.") for the most recently formatted second
+_ts_cache = (-1, "")
+
 
 def setup_logging() -> structlog.BoundLogger:
     """
     Configure structured logging for the NLP service.
     Returns a configured structlog logger.
     """
+    global _min_level
+
     # Configure log level from environment
     log_level = os.getenv("LOG_LEVEL", "INFO").upper()
     level = getattr(logging, log_level, logging.INFO)
+    _min_level = level
 
     # Create JSON formatter with custom field names (industry standard)
     json_formatter = jsonlogger.JsonFormatter(
@@ -58,7 +82,7 @@ def setup_logging() -> structlog.BoundLogger:
             structlog.stdlib.add_logger_name,
             structlog.stdlib.add_log_level,
             structlog.stdlib.PositionalArgumentsFormatter(),
-            structlog.processors.TimeStamper(fmt="iso", utc=True),
+            add_timestamp,
             structlog.processors.StackInfoRenderer(),
             structlog.processors.format_exc_info,
             # Add service identifier
@@ -76,13 +100,185 @@ def setup_logging() -> structlog.BoundLogger:
     return logger
 
 
+def _utc_timestamp() -> str:
+    """ISO-8601 UTC timestamp; the date/time prefix is reformatted once per second."""
+    global _ts_cache
+
+    seconds, nanos = divmod(time.time_ns(), 1_000_000_000)
+    cached_second, prefix = _ts_cache
+    if seconds != cached_second:
+        prefix = time.strftime("%Y-%m-%dT%H:%M:%S.", time.gmtime(seconds))
+        _ts_cache = (seconds, prefix)
+    return f"{prefix}{nanos // 1000:06d}Z"
+
+
+def add_timestamp(logger, method_name: str, event_dict: dict) -> dict:
+    """Add a cached-prefix ISO timestamp to log records."""
+    event_dict["timestamp"] = _utc_timestamp()
+    return event_dict
+
+
 def add_service_info(logger, method_name: str, event_dict: dict) -> dict:
     """Add service information to log records."""
-    event_dict["service"] = "mediawarn-nlp"
-    event_dict["version"] = os.getenv("APP_VERSION", "dev")
+    event_dict["service"] = SERVICE_NAME
+    event_dict["version"] = SERVICE_VERSION
     return event_dict
 
 
+def _build_record(
+    level: int, logger_name: str, event: str, fields: Dict[str, Any]
+) -> Optional[Dict[str, Any]]:
+    """Build a record shaped like structlog's, or None if below the log level."""
+    if level < _min_level:
+        return None
+    return {
+        "event": event,
+        "logger": logger_name,
+        "level": logging.getLevelName(level).lower(),
+        "timestamp": _utc_timestamp(),
+        "service": SERVICE_NAME,
+        "version": SERVICE_VERSION,
+        **fields,
+    }
+
+
+def _serialize_record(record: Dict[str, Any]) -> bytes:
+    """Serialize a log record to JSON bytes."""
+    return dumps_bytes(record, default=str)
+
+
+def _write_record(
+    level: int, logger_name: str, event: str, fields: Dict[str, Any]
+) -> None:
+    """
+    Write one JSON log line straight to stdout.
+    Used by the per-request helpers to skip structlog's processor chain and
+    the logging handler lock.
+    """
+    record = _build_record(level, logger_name, event, fields)
+    if record is not None:
+        sys.stdout.buffer.write(_serialize_record(record) + b"\n")
+        sys.stdout.buffer.flush()
+
+
+def _enqueue_record(
+    level: int, logger_name: str, event: str, fields: Dict[str, Any]
+) -> None:
+    """
+    Queue a record for the background flusher.
+    Written directly instead when no flusher is running or when called off
+    the flusher's thread, e.g. from the model-loading thread pool.
+    """
+    global _dropped_records
+
+    if threading.get_ident() != _flusher_thread:
+        _write_record(level, logger_name, event, fields)
+        return
+
+    record = _build_record(level, logger_name, event, fields)
+    if record is None:
+        return
+    try:
+        _log_queue.put_nowait(record)
+    except asyncio.QueueFull:
+        _dropped_records += 1
+
+
+# Record type -> (logger name, success event, failure event, success level)
+_LOG_KINDS = {
+    "model_operation": (
+        "model",
+        "Model operation completed",
+        "Model operation failed",
+        logging.INFO,
+    ),
+    "processing_operation": (
+        "processing",
+        "Processing operation completed",
+        "Processing operation failed",
+        logging.INFO,
+    ),
+    "http_request": (
+        "api",
+        "HTTP request completed",
+        "HTTP request failed",
+        logging.INFO,
+    ),
+    "database_operation": (
+        "database",
+        "Database operation completed",
+        "Database operation failed",
+        logging.DEBUG,
+    ),
+    "queue_operation": (
+        "queue",
+        "Queue operation completed",
+        "Queue operation failed",
+        logging.DEBUG,
+    ),
+}
+
+
+def _log(kind: str, fields: Dict[str, Any], error: Optional[str] = None) -> None:
+    """
+    Shared implementation of the log_* helpers.
+    Drops unset (None) fields, tags the record with its type and queues it
+    at the kind's level, or at ERROR when an error is given.
+    """
+    logger_name, completed, failed, level = _LOG_KINDS[kind]
+    record_fields = {key: value for key, value in fields.items() if value is not None}
+    record_fields["type"] = kind
+    if error:
+        record_fields["error"] = error
+        _enqueue_record(logging.ERROR, logger_name, failed, record_fields)
+    else:
+        _enqueue_record(level, logger_name, completed, record_fields)
+
+
+def _flush_log_queue(first: Optional[Dict[str, Any]] = None) -> None:
+    """Write `first` and every queued record to stdout in one call."""
+    global _dropped_records
+
+    batch = [] if first is None else [_serialize_record(first)]
+    while not _log_queue.empty():
+        batch.append(_serialize_record(_log_queue.get_nowait()))
+
+    if _dropped_records:
+        record = _build_record(logging.WARNING, "logger", "Dropped log records", {
+            "dropped": _dropped_records,
+            "type": "log_overflow",
+        })
+        _dropped_records = 0
+        if record is not None:
+            batch.append(_serialize_record(record))
+
+    if batch:
+        sys.stdout.buffer.write(b"\n".join(batch) + b"\n")
+        sys.stdout.buffer.flush()
+
+
+async def run_log_flusher(interval: float = 0.005) -> None:
+    """
+    Background task that writes queued log records in batches.
+    Waits for the first record, then gives the queue `interval` seconds to
+    fill before flushing. Remaining records are flushed on cancellation.
+    """
+    global _flusher_thread
+
+    _flusher_thread = threading.get_ident()
+    # Kept outside the loop so a record dequeued before cancellation is still written
+    first = None
+    try:
+        while True:
+            first = await _log_queue.get()
+            await asyncio.sleep(interval)
+            _flush_log_queue(first)
+            first = None
+    finally:
+        _flusher_thread = None
+        _flush_log_queue(first)
+
+
 class LoggerMixin:
     """Mixin class to add structured logging to other classes."""
 
@@ -123,25 +319,13 @@ def log_model_operation(
     error: Optional[str] = None
 ) -> None:
     """Log ML model operations with performance metrics."""
-    logger = structlog.get_logger("model")
-
-    log_data = {
+    _log("model_operation", {
         "operation": operation,
         "model_name": model_name,
-        "type": "model_operation"
-    }
-
-    if duration_ms is not None:
-        log_data["duration_ms"] = duration_ms
-    if input_tokens is not None:
-        log_data["input_tokens"] = input_tokens
-    if output_tokens is not None:
-        log_data["output_tokens"] = output_tokens
-
-    if error:
-        logger.error("Model operation failed", error=error, **log_data)
-    else:
-        logger.info("Model operation completed", **log_data)
+        "duration_ms": duration_ms,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+    }, error)
 
 
 def log_processing_operation(
@@ -153,23 +337,13 @@ def log_processing_operation(
     error: Optional[str] = None
 ) -> None:
     """Log file processing operations."""
-    logger = structlog.get_logger("processing")
-
-    log_data = {
+    _log("processing_operation", {
         "operation": operation,
         "file_path": file_path,
         "duration_ms": duration_ms,
         "input_size": input_size,
-        "type": "processing_operation"
-    }
-
-    if output_size is not None:
-        log_data["output_size"] = output_size
-
-    if error:
-        logger.error("Processing operation failed", error=error, **log_data)
-    else:
-        logger.info("Processing operation completed", **log_data)
+        "output_size": output_size,
+    }, error)
 
 
 def log_api_request(
@@ -182,19 +356,15 @@ def log_api_request(
     request_id: Optional[str] = None
 ) -> None:
     """Log API requests with performance metrics."""
-    logger = structlog.get_logger("api")
-
-    logger.info(
-        "HTTP request completed",
-        method=method,
-        path=path,
-        status_code=status_code,
-        duration_ms=duration_ms,
-        client_ip=client_ip,
-        user_agent=user_agent,
-        request_id=request_id,
-        type="http_request"
-    )
+    _log("http_request", {
+        "method": method,
+        "path": path,
+        "status_code": status_code,
+        "duration_ms": duration_ms,
+        "client_ip": client_ip,
+        "user_agent": user_agent,
+        "request_id": request_id,
+    })
 
 
 def log_database_operation(
@@ -205,20 +375,12 @@ def log_database_operation(
     error: Optional[str] = None
 ) -> None:
     """Log database operations."""
-    logger = structlog.get_logger("database")
-
-    log_data = {
+    _log("database_operation", {
         "operation": operation,
         "table": table,
         "duration_ms": duration_ms,
         "rows_affected": rows_affected,
-        "type": "database_operation"
-    }
-
-    if error:
-        logger.error("Database operation failed", error=error, **log_data)
-    else:
-        logger.debug("Database operation completed", **log_data)
+    }, error)
 
 
 def log_queue_operation(
@@ -228,19 +390,11 @@ def log_queue_operation(
     error: Optional[str] = None
 ) -> None:
     """Log queue operations (Celery/Redis)."""
-    logger = structlog.get_logger("queue")
-
-    log_data = {
+    _log("queue_operation", {
         "operation": operation,
         "queue_name": queue_name,
         "message_count": message_count,
-        "type": "queue_operation"
-    }
-
-    if error:
-        logger.error("Queue operation failed", error=error, **log_data)
-    else:
-        logger.debug("Queue operation completed", **log_data)
+    }, error)
 
 
 # Performance measurement decorator
@@ -249,11 +403,11 @@ def log_performance(operation_name: str):
     def decorator(func):
         def wrapper(*args, **kwargs):
             logger = structlog.get_logger("performance")
-            start_time = time.time()
+            start_ns = time.perf_counter_ns()
 
             try:
                 result = func(*args, **kwargs)
-                duration_ms = int((time.time() - start_time) * 1000)
+                duration_ms = (time.perf_counter_ns() - start_ns) // 1_000_000
 
                 logger.info(
                     "Operation completed",
@@ -265,7 +419,7 @@ def log_performance(operation_name: str):
                 return result
 
             except Exception as e:
-                duration_ms = int((time.time() - start_time) * 1000)
+                duration_ms = (time.perf_counter_ns() - start_ns) // 1_000_000
 
                 logger.error(
                     "Operation failed",
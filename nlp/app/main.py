@@ -7,7 +7,10 @@ from fastapi import FastAPI, Request
 from fastapi.middleware.base import BaseHTTPMiddleware
 from app.worker import start_worker
 from app.models import initialize_models
-from app.logger import setup_logging, log_startup, log_shutdown, log_api_request, get_logger
+from app.logger import (
+    setup_logging, log_startup, log_shutdown, log_api_request, get_logger,
+    run_log_flusher,
+)
 
 # Initialize structured logging
 setup_logging()
@@ -16,11 +19,11 @@ logger = get_logger("main")
 # Logging middleware for API requests
 class LoggingMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
+        start_ns = time.perf_counter_ns()
 
         response = await call_next(request)
 
-        duration_ms = int((time.time() - start_time) * 1000)
+        duration_ms = (time.perf_counter_ns() - start_ns) // 1_000_000
 
         log_api_request(
             method=request.method,
@@ -37,6 +40,9 @@ class LoggingMiddleware(BaseHTTPMiddleware):
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Batch request logs off the request path
+    log_flusher_task = asyncio.create_task(run_log_flusher())
+
     # Log startup
     version = os.getenv("APP_VERSION", "1.0.0")
     config = {
@@ -65,6 +71,12 @@ async def lifespan(app: FastAPI):
     except asyncio.CancelledError:
         pass
 
+    log_flusher_task.cancel()
+    try:
+        await log_flusher_task
+    except asyncio.CancelledError:
+        pass
+
 
 app = FastAPI(
     title="Content Warning Scanner - NLP Service",
@@ -91,11 +103,25 @@ async def list_models():
 if __name__ == "__main__":
     import uvicorn
 
+    # Use uvloop/httptools when available (uvloop is not supported on Windows)
+    try:
+        import uvloop  # noqa: F401
+        loop = "uvloop"
+    except ImportError:
+        loop = "asyncio"
+    try:
+        import httptools  # noqa: F401
+        http = "httptools"
+    except ImportError:
+        http = "h11"
+
     # Configure uvicorn logging to use our structured logger
     config = uvicorn.Config(
         app,
         host="0.0.0.0",
         port=8001,
+        loop=loop,
+        http=http,
         log_config=None,  # Disable uvicorn's default logging
         access_log=False  # We handle access logs via middleware
     )
@@ -1,11 +1,19 @@
+import asyncio
 import re
 import os
-import subprocess
 import logging
-from typing import List, Dict
+from typing import List, Dict, Iterable, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+# SRT scanner states: cue number, timing line, cue text
+_STATE_NUMBER = 0
+_STATE_TIME = 1
+_STATE_TEXT = 2
+
+# HTML/formatting tags inside cue text
+_TAG_RE = re.compile(r'<[^>]+>')
+
 async def parse_subtitle_file(file_path: str) -> List[Dict]:
     """Parse subtitle file and return list of subtitle entries with timestamps"""
     
@@ -23,108 +31,183 @@ async def parse_subtitle_file(file_path: str) -> List[Dict]:
 
 async def parse_subtitle_text_file(file_path: str) -> List[Dict]:
     """Parse .srt or .vtt subtitle files"""
+    file_ext = os.path.splitext(file_path)[1].lower()
+    
     try:
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
+        # Stream the file line by line so only the current cue is held in memory
+        with open(file_path, 'r', encoding='utf-8-sig', errors='ignore') as f:
+            if file_ext == '.srt':
+                return _parse_srt_lines(f)
+            elif file_ext == '.vtt':
+                return _parse_vtt_lines(f)
     except Exception as e:
         logger.error(f"Error reading file {file_path}: {e}")
         return []
     
-    file_ext = os.path.splitext(file_path)[1].lower()
-    
-    if file_ext == '.srt':
-        return parse_srt_content(content)
-    elif file_ext == '.vtt':
-        return parse_vtt_content(content)
-    
     return []
 
 def parse_srt_content(content: str) -> List[Dict]:
     """Parse SRT subtitle content"""
+    # Content without a single timing line has no cues to split out
+    if '-->' not in content:
+        return []
+    return _parse_srt_lines(content.split('\n'))
+
+def parse_vtt_content(content: str) -> List[Dict]:
+    """Parse VTT subtitle content"""
+    if '-->' not in content:
+        return []
+    return _parse_vtt_lines(content.split('\n'))
+
+def _parse_srt_lines(lines: Iterable[str]) -> List[Dict]:
+    """Parse SRT lines in a single pass: number, timestamp, text, blank line"""
     entries = []
+    state = _STATE_NUMBER
+    number = 0
+    start_time = end_time = None
+    text_lines = []
     
-    # SRT format: number, timestamp, text, blank line
-    pattern = r'(\d+)\s*\n(\d{2}:\d{2}:\d{2},\d{3})\s*-->\s*(\d{2}:\d{2}:\d{2},\d{3})\s*\n(.*?)(?=\n\s*\n|\n\s*\d+\s*\n|\Z)'
-    
-    matches = re.findall(pattern, content, re.DOTALL | re.MULTILINE)
-    
-    for match in matches:
-        number, start_time, end_time, text = match
+    for line in lines:
+        line = line.rstrip('\r\n')
+        stripped = line.strip()
         
-        # Clean up text
-        text = re.sub(r'<[^>]+>', '', text)  # Remove HTML tags
-        text = text.replace('\n', ' ').strip()
-        
-        if text:
-            entries.append({
-                "number": int(number),
-                "start_time": convert_srt_time_to_seconds(start_time),
-                "end_time": convert_srt_time_to_seconds(end_time),
-                "text": text
-            })
+        if state == _STATE_TEXT:
+            timing = _parse_timing(stripped, ',') if stripped else None
+            if timing:
+                # A timing line inside cue text starts the next cue; a bare
+                # number just before it is that cue's number
+                next_number = number + 1
+                if text_lines and text_lines[-1].strip().isdecimal():
+                    next_number = int(text_lines.pop().strip())
+                _append_entry(entries, number, start_time, end_time, text_lines)
+                number = next_number
+                start_time, end_time = timing
+                text_lines = []
+            elif not stripped:
+                # Blank lines right after the timestamp don't end the cue
+                if text_lines:
+                    _append_entry(entries, number, start_time, end_time, text_lines)
+                    state = _STATE_NUMBER
+            else:
+                text_lines.append(line)
+        elif state == _STATE_TIME:
+            timing = _parse_timing(stripped, ',')
+            if timing:
+                start_time, end_time = timing
+                text_lines = []
+                state = _STATE_TEXT
+            elif stripped.isdecimal():
+                number = int(stripped)
+            elif stripped:
+                state = _STATE_NUMBER
+        elif stripped.isdecimal():
+            number = int(stripped)
+            state = _STATE_TIME
+    
+    if state == _STATE_TEXT:
+        _append_entry(entries, number, start_time, end_time, text_lines)
     
     return entries
 
-def parse_vtt_content(content: str) -> List[Dict]:
-    """Parse VTT subtitle content"""
+def _parse_vtt_lines(lines: Iterable[str]) -> List[Dict]:
+    """Parse VTT lines in a single pass: timestamp, text, blank line"""
     entries = []
+    in_cue = False
+    number = 0
+    start_time = end_time = None
+    text_lines = []
     
-    # VTT format: timestamp, text, blank line
-    pattern = r'(\d{2}:\d{2}:\d{2}\.\d{3})\s*-->\s*(\d{2}:\d{2}:\d{2}\.\d{3})\s*\n(.*?)(?=\n\s*\n|\n\s*\d{2}:\d{2}:\d{2}|\Z)'
-    
-    matches = re.findall(pattern, content, re.DOTALL | re.MULTILINE)
-    
-    for i, match in enumerate(matches):
-        start_time, end_time, text = match
+    for line in lines:
+        line = line.rstrip('\r\n')
+        stripped = line.strip()
         
-        # Clean up text
-        text = re.sub(r'<[^>]+>', '', text)  # Remove HTML tags
-        text = text.replace('\n', ' ').strip()
+        if in_cue and not stripped:
+            # Blank lines right after the timestamp don't end the cue
+            if text_lines:
+                _append_entry(entries, number, start_time, end_time, text_lines)
+                in_cue = False
+            continue
         
-        if text:
-            entries.append({
-                "number": i + 1,
-                "start_time": convert_vtt_time_to_seconds(start_time),
-                "end_time": convert_vtt_time_to_seconds(end_time),
-                "text": text
-            })
+        # Header, NOTE/STYLE blocks and cue identifiers are skipped until a timing line
+        timing = _parse_timing(stripped, '.')
+        if timing:
+            if in_cue:
+                _append_entry(entries, number, start_time, end_time, text_lines)
+            start_time, end_time = timing
+            number += 1
+            text_lines = []
+            in_cue = True
+        elif in_cue:
+            text_lines.append(line)
+    
+    if in_cue:
+        _append_entry(entries, number, start_time, end_time, text_lines)
     
     return entries
 
+def _parse_timing(line: str, separator: str) -> Optional[Tuple[int, int]]:
+    """Return (start, end) in milliseconds from a "start --> end" line, else None"""
+    arrow = line.find('-->')
+    if arrow < 0:
+        return None
+    
+    start = line[:arrow].strip()
+    # VTT cue settings may follow the end timestamp
+    end = line[arrow + 3:].split(None, 1)
+    if end and _is_timestamp(start, separator) and _is_timestamp(end[0], separator):
+        return convert_timestamp_to_ms(start), convert_timestamp_to_ms(end[0])
+    return None
+
+def _is_timestamp(value: str, separator: str) -> bool:
+    """Check for an HH:MM:SS<separator>mmm timestamp"""
+    return (
+        len(value) == 12
+        and value[2] == ':' and value[5] == ':' and value[8] == separator
+        and (value[:2] + value[3:5] + value[6:8] + value[9:]).isdecimal()
+    )
+
+def _append_entry(entries: List[Dict], number: int, start_time: int, end_time: int,
+                  text_lines: List[str]):
+    """Clean up cue text and append the entry if any text is left"""
+    text = _strip_tags(' '.join(text_lines)).strip()
+    
+    if text:
+        entries.append({
+            "number": number,
+            "start_time": start_time,
+            "end_time": end_time,
+            "text": text
+        })
+
+def _strip_tags(text: str) -> str:
+    """Remove HTML/formatting tags from cue text"""
+    # Most cues carry no markup; only those with a '<' reach the regex engine
+    if '<' not in text:
+        return text
+    return _TAG_RE.sub('', text)
+
 async def extract_subtitles_from_video(file_path: str) -> List[Dict]:
     """Extract subtitles from video file using FFmpeg"""
     try:
-        # First, check if video has subtitle streams
-        cmd = [
-            'ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_streams',
-            '-select_streams', 's', file_path
-        ]
+        # Extract first subtitle stream as SRT straight to stdout; a video
+        # without subtitle streams makes ffmpeg fail the -map, so no probe is needed
+        extract = await asyncio.create_subprocess_exec(
+            'ffmpeg', '-v', 'error', '-i', file_path,
+            '-map', '0:s:0', '-c:s', 'srt', '-f', 'srt', 'pipe:1',
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+        srt_bytes, stderr = await extract.communicate()
         
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        if extract.returncode == 0:
+            # Parse extracted SRT output
+            return parse_srt_content(srt_bytes.decode('utf-8', errors='ignore'))
         
-        if result.returncode != 0:
+        stderr_text = stderr.decode('utf-8', errors='ignore')
+        if "matches no streams" in stderr_text:
             logger.warning(f"No subtitle streams found in {file_path}")
-            return []
-        
-        # Extract first subtitle stream to SRT format
-        import tempfile
-        with tempfile.NamedTemporaryFile(suffix='.srt', delete=False) as temp_file:
-            temp_path = temp_file.name
-        
-        extract_cmd = [
-            'ffmpeg', '-i', file_path, '-map', '0:s:0', '-c:s', 'srt', temp_path, '-y'
-        ]
-        
-        extract_result = subprocess.run(extract_cmd, capture_output=True, text=True)
-        
-        if extract_result.returncode == 0:
-            # Parse extracted SRT file
-            entries = await parse_subtitle_text_file(temp_path)
-            os.unlink(temp_path)  # Clean up temp file
-            return entries
         else:
-            logger.warning(f"Failed to extract subtitles from {file_path}: {extract_result.stderr}")
-            return []
+            logger.error(f"Failed to extract subtitles from {file_path}: {stderr_text}")
+        return []
             
     except FileNotFoundError:
         logger.error("FFmpeg not found. Please install FFmpeg to process video files.")
@@ -133,11 +216,10 @@ async def extract_subtitles_from_video(file_path: str) -> List[Dict]:
         logger.error(f"Error extracting subtitles from {file_path}: {e}")
         return []
 
-def convert_srt_time_to_seconds(time_str: str) -> str:
-    """Convert SRT timestamp to seconds format"""
-    # Convert from HH:MM:SS,mmm to HH:MM:SS.mmm
-    return time_str.replace(',', '.')
-
-def convert_vtt_time_to_seconds(time_str: str) -> str:
-    """Convert VTT timestamp to seconds format (already in correct format)"""
-    return time_str
\ No newline at end of file
+def convert_timestamp_to_ms(time_str: str) -> int:
+    """Convert an HH:MM:SS,mmm (SRT) or HH:MM:SS.mmm (VTT) timestamp to milliseconds"""
+    hours = int(time_str[0:2])
+    minutes = int(time_str[3:5])
+    seconds = int(time_str[6:8])
+    milliseconds = int(time_str[9:12])
+    return ((hours * 60 + minutes) * 60 + seconds) * 1000 + milliseconds
@@ -1,23 +1,89 @@
 import asyncio
-import json
+import datetime
 import logging
 import time
+import uuid
+from collections import OrderedDict
 from typing import Optional
 
+import asyncpg
+import numpy as np
 import redis.asyncio as redis
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
-from app.models import analyze_subtitle_text
+from app import jsonutil
+from app.models import analyze_subtitle_texts, SEVERITY_LEVELS
 from app.subtitle_parser import parse_subtitle_file
 import os
 
 logger = logging.getLogger(__name__)
 
+# Jobs are pushed here by the API/scanner and parked in a per-worker
+# processing list while that worker handles them. Each worker refreshes a
+# heartbeat key; a processing list whose owner's heartbeat has expired
+# belongs to a dead worker and its jobs are requeued.
+SCAN_JOBS_QUEUE = "scan_jobs"
+PROCESSING_QUEUE_PREFIX = "scan_jobs:processing:"
+HEARTBEAT_KEY_PREFIX = "scan_jobs:heartbeat:"
+HEARTBEAT_INTERVAL_SECONDS = 15
+HEARTBEAT_TTL_SECONDS = 60
+
+# Idle pooled connections are closed after this long
+DB_POOL_MAX_IDLE_SECONDS = 1800
+
+# Paths whose files.id is remembered between a job's status update and its results
+FILE_ID_CACHE_SIZE = 10_000
+
+# Query texts shared by the job-processing methods
+UPDATE_FILE_STATUS_SQL = """
+    UPDATE files 
+    SET scan_status = $1, 
+        last_scanned = CURRENT_TIMESTAMP 
+    WHERE path = $2
+    RETURNING id
+"""
+
+SELECT_FILE_ID_SQL = "SELECT id FROM files WHERE path = $1"
+
+INSERT_SCAN_RESULT_SQL = """
+    INSERT INTO scan_results 
+    (file_id, model_version, processing_time_ms, overall_risk_score, 
+     highest_severity, total_triggers, metadata)
+    VALUES ($1, $2, $3, $4, $5, $6, $7)
+    RETURNING id
+"""
+
+INSERT_TRIGGER_SQL = """
+    INSERT INTO triggers
+    (scan_result_id, category, severity, confidence_score, timestamp_start,
+     timestamp_end, subtitle_text, context_before, context_after)
+    VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+"""
+
+# Severity name -> level; SEVERITY_LEVELS maps levels back to names
+_SEVERITY = {name: level for level, name in enumerate(SEVERITY_LEVELS)}
+
+def _ms_to_time(milliseconds: int) -> datetime.time:
+    """Convert a subtitle offset in milliseconds to a datetime.time for TIME columns"""
+    seconds, ms = divmod(milliseconds, 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return datetime.time(hours, minutes, seconds, ms * 1000)
+
 class NLPWorker:
     def __init__(self):
         self.redis_client = None
-        self.db_session = None
+        self.db_pool = None
         self.running = False
+        # Jobs processed concurrently by this worker
+        self.concurrency = int(os.getenv("WORKER_CONCURRENCY", "4"))
+        self.job_slots = asyncio.Semaphore(self.concurrency)
+        self.job_tasks = set()
+        # Unique per process: hostnames repeat across host-network replicas
+        self.worker_id = os.getenv("WORKER_ID") or uuid.uuid4().hex
+        self.processing_queue = PROCESSING_QUEUE_PREFIX + self.worker_id
+        self.heartbeat_key = HEARTBEAT_KEY_PREFIX + self.worker_id
+        self.heartbeat_task = None
+        # path -> files.id, least recently used first
+        self._file_id_cache = OrderedDict()
         
     async def initialize(self):
         """Initialize Redis and Database connections"""
@@ -29,212 +95,288 @@ class NLPWorker:
             await self.redis_client.ping()
             logger.info("Connected to Redis")
             
-            # Initialize database connection
-            engine = create_engine(database_url)
-            SessionLocal = sessionmaker(bind=engine)
-            self.db_session = SessionLocal()
+            # Claim this worker's id before looking for dead workers' jobs;
+            # nothing is in flight yet, so a list already under it is stale
+            await self.send_heartbeat()
+            await self._requeue_processing_list(self.processing_queue, self.worker_id)
+            await self.requeue_interrupted_jobs()
+            
+            # Initialize database connection pool; each in-flight job holds
+            # one connection
+            self.db_pool = await asyncpg.create_pool(
+                database_url,
+                min_size=1,
+                max_size=self.concurrency,
+                max_inactive_connection_lifetime=DB_POOL_MAX_IDLE_SECONDS
+            )
             logger.info("Connected to PostgreSQL")
             
         except Exception as e:
             logger.error(f"Failed to initialize connections: {e}")
             raise
     
+    async def send_heartbeat(self):
+        """Mark this worker alive for the next HEARTBEAT_TTL_SECONDS"""
+        await self.redis_client.set(self.heartbeat_key, b"1", ex=HEARTBEAT_TTL_SECONDS)
+    
+    async def run_heartbeat(self):
+        """Refresh the heartbeat and requeue dead workers' jobs until cancelled"""
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL_SECONDS)
+            try:
+                await self.send_heartbeat()
+                await self.requeue_interrupted_jobs()
+            except Exception as e:
+                logger.error(f"Heartbeat error: {e}")
+    
+    async def requeue_interrupted_jobs(self):
+        """Move jobs from dead workers' processing lists back to the queue"""
+        pattern = PROCESSING_QUEUE_PREFIX + "*"
+        async for key in self.redis_client.scan_iter(match=pattern):
+            owner = key.decode()[len(PROCESSING_QUEUE_PREFIX):]
+            if owner == self.worker_id:
+                continue
+            if await self.redis_client.exists(HEARTBEAT_KEY_PREFIX + owner):
+                continue
+            await self._requeue_processing_list(key, owner)
+    
+    async def _requeue_processing_list(self, key, owner: str):
+        """Move every job in one processing list back to the queue"""
+        requeued = 0
+        # Take the newest first and push each to the consuming end, so the
+        # oldest interrupted job is the next one popped
+        while await self.redis_client.lmove(key, SCAN_JOBS_QUEUE, "LEFT", "RIGHT"):
+            requeued += 1
+        
+        if requeued:
+            logger.info(f"Requeued {requeued} interrupted jobs from worker {owner}")
+    
     async def start(self):
         """Start the worker loop"""
         await self.initialize()
+        self.heartbeat_task = asyncio.create_task(self.run_heartbeat())
         self.running = True
         logger.info("NLP Worker started")
         
         while self.running:
             try:
-                # Pop job from queue with timeout
-                job_data = await self.redis_client.brpop("scan_jobs", timeout=5)
+                # Only take a job off the queue once there is a free slot for it
+                await self.job_slots.acquire()
                 
-                if job_data:
-                    _, job_json = job_data
-                    job = json.loads(job_json)
-                    logger.info(f"Processing job: {job['id']}")
-                    
-                    await self.process_job(job)
+                # Atomically move the next job to the processing list
+                job_json = await self.redis_client.brpoplpush(
+                    SCAN_JOBS_QUEUE, self.processing_queue, timeout=30
+                )
+                
+                if job_json:
+                    task = asyncio.create_task(self._run_job(job_json))
+                    self.job_tasks.add(task)
+                    task.add_done_callback(self.job_tasks.discard)
+                else:
+                    self.job_slots.release()
                     
             except asyncio.CancelledError:
                 logger.info("Worker cancelled")
                 break
             except Exception as e:
+                self.job_slots.release()
                 logger.error(f"Worker error: {e}")
                 await asyncio.sleep(1)
         
+        # Let in-flight jobs finish before closing connections
+        if self.job_tasks:
+            await asyncio.gather(*self.job_tasks, return_exceptions=True)
+        
         await self.cleanup()
     
+    async def _run_job(self, job_json: bytes):
+        """Process a job, then acknowledge it and free its slot"""
+        try:
+            job = jsonutil.loads(job_json)
+            logger.info(f"Processing job: {job['id']}")
+            
+            await self.process_job(job)
+        except Exception as e:
+            logger.error(f"Error handling job {job_json!r}: {e}")
+        finally:
+            self.job_slots.release()
+            try:
+                await self.redis_client.lrem(self.processing_queue, 1, job_json)
+            except Exception as e:
+                logger.error(f"Error acknowledging job: {e}")
+    
     async def process_job(self, job: dict):
-        """Process a single scan job"""
+        """Process a single scan job on one pooled connection"""
         start_time = time.time()
         file_path = job["file_path"]
         
-        try:
-            # Update file status to processing
-            await self.update_file_status(file_path, "processing")
-            
-            # Parse subtitle content
-            subtitle_entries = await parse_subtitle_file(file_path)
-            
-            if not subtitle_entries:
-                logger.warning(f"No subtitle content found in {file_path}")
-                await self.update_file_status(file_path, "completed")
-                return
-            
-            # Analyze each subtitle entry
-            all_triggers = []
-            
-            for i, entry in enumerate(subtitle_entries):
-                # Get context (previous and next entries)
-                context_before = ""
-                context_after = ""
+        async with self.db_pool.acquire() as conn:
+            try:
+                # Update file status to processing
+                await self.update_file_status(conn, file_path, "processing")
                 
-                if i > 0:
-                    context_before = subtitle_entries[i-1]["text"]
-                if i < len(subtitle_entries) - 1:
-                    context_after = subtitle_entries[i+1]["text"]
+                # Parse subtitle content
+                subtitle_entries = await parse_subtitle_file(file_path)
                 
-                # Analyze the text (now async)
-                triggers = await analyze_subtitle_text(
-                    entry["text"], 
-                    context_before, 
-                    context_after
+                if not subtitle_entries:
+                    logger.warning(f"No subtitle content found in {file_path}")
+                    await self.update_file_status(conn, file_path, "completed")
+                    return
+                
+                # Analyze all subtitle entries in one batch, each with the
+                # previous and next entries as context
+                texts = [entry["text"] for entry in subtitle_entries]
+                contexts_before = [""] + texts[:-1]
+                contexts_after = texts[1:] + [""]
+                
+                triggers_per_entry = await analyze_subtitle_texts(
+                    list(zip(texts, contexts_before, contexts_after))
                 )
                 
-                for trigger in triggers:
-                    trigger.update({
-                        "timestamp_start": entry["start_time"],
-                        "timestamp_end": entry["end_time"],
-                        "subtitle_text": entry["text"],
-                        "context_before": context_before,
-                        "context_after": context_after
-                    })
-                    all_triggers.append(trigger)
-            
-            # Calculate processing time
-            processing_time_ms = int((time.time() - start_time) * 1000)
-            
-            # Calculate overall scores
-            overall_risk_score = 0
-            highest_severity = "none"
-            
-            if all_triggers:
-                # Calculate risk score as weighted average
-                total_score = sum(t["score"] * t["confidence"] for t in all_triggers)
-                total_weight = sum(t["confidence"] for t in all_triggers)
-                overall_risk_score = total_score / total_weight if total_weight > 0 else 0
+                all_triggers = []
                 
-                # Find highest severity
-                severity_levels = {"none": 0, "mild": 1, "moderate": 2, "severe": 3}
-                max_severity_level = max(severity_levels[t["severity"]] for t in all_triggers)
-                highest_severity = [k for k, v in severity_levels.items() if v == max_severity_level][0]
-            
-            # Store results in database
-            await self.store_scan_results(
-                file_path,
-                all_triggers,
-                processing_time_ms,
-                overall_risk_score,
-                highest_severity
-            )
-            
-            # Update file status
-            await self.update_file_status(file_path, "completed")
-            
-            logger.info(f"Completed processing {file_path}: {len(all_triggers)} triggers found, "
-                       f"overall risk: {overall_risk_score:.2f}, highest severity: {highest_severity}")
-            
-        except Exception as e:
-            logger.error(f"Error processing {file_path}: {e}")
-            await self.update_file_status(file_path, "error")
+                for entry, context_before, context_after, triggers in zip(
+                    subtitle_entries, contexts_before, contexts_after,
+                    triggers_per_entry
+                ):
+                    # Context strings are shared by reference with the
+                    # neighbouring entries
+                    all_triggers.extend(
+                        {
+                            **trigger,
+                            "timestamp_start": entry["start_time"],
+                            "timestamp_end": entry["end_time"],
+                            "subtitle_text": entry["text"],
+                            "context_before": context_before,
+                            "context_after": context_after
+                        }
+                        for trigger in triggers
+                    )
+                
+                # Calculate processing time
+                processing_time_ms = int((time.time() - start_time) * 1000)
+                
+                # Calculate overall scores
+                overall_risk_score = 0
+                highest_severity = "none"
+                
+                if all_triggers:
+                    count = len(all_triggers)
+                    scores = np.fromiter(
+                        (t["score"] for t in all_triggers),
+                        dtype=np.float64, count=count
+                    )
+                    confidences = np.fromiter(
+                        (t["confidence"] for t in all_triggers),
+                        dtype=np.float64, count=count
+                    )
+                    
+                    # Calculate risk score as weighted average
+                    total_weight = confidences.sum()
+                    overall_risk_score = (
+                        float(np.dot(scores, confidences) / total_weight)
+                        if total_weight > 0 else 0
+                    )
+                    
+                    # Find highest severity
+                    severity_codes = np.fromiter(
+                        (_SEVERITY[t["severity"]] for t in all_triggers),
+                        dtype=np.int8, count=count
+                    )
+                    highest_severity = SEVERITY_LEVELS[severity_codes.max()]
+                
+                # Store results and mark the file completed in one transaction
+                async with conn.transaction():
+                    await self.store_scan_results(
+                        conn,
+                        file_path,
+                        all_triggers,
+                        processing_time_ms,
+                        overall_risk_score,
+                        highest_severity
+                    )
+                    await self._set_file_status(conn, file_path, "completed")
+                
+                logger.info(f"Completed processing {file_path}: {len(all_triggers)} triggers found, "
+                           f"overall risk: {overall_risk_score:.2f}, highest severity: {highest_severity}")
+                
+            except Exception as e:
+                logger.error(f"Error processing {file_path}: {e}")
+                await self.update_file_status(conn, file_path, "error")
     
-    async def update_file_status(self, file_path: str, status: str):
+    async def update_file_status(self, conn: asyncpg.Connection, file_path: str,
+                                 status: str):
         """Update file status in database"""
         try:
-            query = text("""
-                UPDATE files 
-                SET scan_status = :status, 
-                    last_scanned = CURRENT_TIMESTAMP 
-                WHERE path = :path
-            """)
-            
-            self.db_session.execute(query, {"status": status, "path": file_path})
-            self.db_session.commit()
+            await self._set_file_status(conn, file_path, status)
             
         except Exception as e:
             logger.error(f"Error updating file status: {e}")
-            self.db_session.rollback()
     
-    async def store_scan_results(self, file_path: str, triggers: list, processing_time_ms: int, 
-                                overall_risk_score: float, highest_severity: str):
-        """Store scan results in database"""
-        try:
-            # Get file ID
-            file_query = text("SELECT id FROM files WHERE path = :path")
-            result = self.db_session.execute(file_query, {"path": file_path}).fetchone()
+    async def _set_file_status(self, conn: asyncpg.Connection, file_path: str,
+                               status: str):
+        """Update file status, raising on failure so the transaction rolls back"""
+        file_id = await conn.fetchval(UPDATE_FILE_STATUS_SQL, status, file_path)
+        
+        if file_id is not None:
+            self._cache_file_id(file_path, file_id)
+        else:
+            # The row is gone; don't let a stale id outlive it
+            self._file_id_cache.pop(file_path, None)
+    
+    def _cache_file_id(self, file_path: str, file_id: int):
+        """Remember a path's file id, evicting the least recently used entry"""
+        self._file_id_cache[file_path] = file_id
+        self._file_id_cache.move_to_end(file_path)
+        if len(self._file_id_cache) > FILE_ID_CACHE_SIZE:
+            self._file_id_cache.popitem(last=False)
+    
+    async def store_scan_results(self, conn: asyncpg.Connection, file_path: str,
+                                 triggers: list, processing_time_ms: int,
+                                 overall_risk_score: float, highest_severity: str):
+        """Store scan results in database.
+        
+        Runs inside the caller's transaction and raises on failure, so the
+        results are committed together with the file's final status.
+        """
+        # Get file ID, usually already known from the status update
+        file_id = self._file_id_cache.get(file_path)
+        if file_id is None:
+            file_id = await conn.fetchval(SELECT_FILE_ID_SQL, file_path)
             
-            if not result:
+            if file_id is None:
                 logger.error(f"File not found in database: {file_path}")
                 return
             
-            file_id = result[0]
-            
-            # Insert scan result
-            scan_result_query = text("""
-                INSERT INTO scan_results 
-                (file_id, model_version, processing_time_ms, overall_risk_score, 
-                 highest_severity, total_triggers, metadata)
-                VALUES (:file_id, :model_version, :processing_time_ms, :overall_risk_score,
-                        :highest_severity, :total_triggers, :metadata)
-                RETURNING id
-            """)
-            
-            metadata = json.dumps({"processed_at": time.time()})
-            
-            scan_result = self.db_session.execute(scan_result_query, {
-                "file_id": file_id,
-                "model_version": "v1.0",
-                "processing_time_ms": processing_time_ms,
-                "overall_risk_score": overall_risk_score,
-                "highest_severity": highest_severity,
-                "total_triggers": len(triggers),
-                "metadata": metadata
-            }).fetchone()
-            
-            scan_result_id = scan_result[0]
-            
-            # Insert triggers
-            if triggers:
-                trigger_query = text("""
-                    INSERT INTO triggers
-                    (scan_result_id, category, severity, confidence_score, timestamp_start,
-                     timestamp_end, subtitle_text, context_before, context_after)
-                    VALUES (:scan_result_id, :category, :severity, :confidence_score,
-                            :timestamp_start, :timestamp_end, :subtitle_text,
-                            :context_before, :context_after)
-                """)
-                
-                for trigger in triggers:
-                    self.db_session.execute(trigger_query, {
-                        "scan_result_id": scan_result_id,
-                        "category": trigger["category"],
-                        "severity": trigger["severity"],
-                        "confidence_score": trigger["confidence"],
-                        "timestamp_start": trigger["timestamp_start"],
-                        "timestamp_end": trigger["timestamp_end"],
-                        "subtitle_text": trigger["subtitle_text"],
-                        "context_before": trigger.get("context_before", ""),
-                        "context_after": trigger.get("context_after", "")
-                    })
-            
-            self.db_session.commit()
-            logger.info(f"Stored scan results for {file_path}: {len(triggers)} triggers")
-            
-        except Exception as e:
-            logger.error(f"Error storing scan results: {e}")
-            self.db_session.rollback()
+            self._cache_file_id(file_path, file_id)
+        
+        metadata = jsonutil.dumps_str({"processed_at": time.time()})
+        
+        # Insert scan result
+        scan_result_id = await conn.fetchval(
+            INSERT_SCAN_RESULT_SQL, file_id, "v1.0", processing_time_ms,
+            overall_risk_score, highest_severity, len(triggers), metadata
+        )
+        
+        # Insert triggers
+        if triggers:
+            # One executemany call instead of a round trip per trigger
+            await conn.executemany(INSERT_TRIGGER_SQL, [
+                (
+                    scan_result_id,
+                    trigger["category"],
+                    trigger["severity"],
+                    trigger["confidence"],
+                    _ms_to_time(trigger["timestamp_start"]),
+                    _ms_to_time(trigger["timestamp_end"]),
+                    trigger["subtitle_text"],
+                    trigger.get("context_before", ""),
+                    trigger.get("context_after", "")
+                )
+                for trigger in triggers
+            ])
+        
+        logger.info(f"Stored scan results for {file_path}: {len(triggers)} triggers")
     
     def stop(self):
         """Stop the worker"""
@@ -242,10 +384,21 @@ class NLPWorker:
     
     async def cleanup(self):
         """Clean up connections"""
+        if self.heartbeat_task:
+            self.heartbeat_task.cancel()
+            try:
+                await self.heartbeat_task
+            except asyncio.CancelledError:
+                pass
         if self.redis_client:
+            try:
+                # In-flight jobs are done, so nothing is left to requeue
+                await self.redis_client.delete(self.heartbeat_key)
+            except Exception as e:
+                logger.error(f"Error removing heartbeat: {e}")
             await self.redis_client.close()
-        if self.db_session:
-            self.db_session.close()
+        if self.db_pool:
+            await self.db_pool.close()
 
 async def start_worker():
     """Start the NLP worker"""
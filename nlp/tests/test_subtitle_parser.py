@@ -0,0 +1,104 @@
+import asyncio
+
+from app.subtitle_parser import (
+    convert_timestamp_to_ms,
+    parse_srt_content,
+    parse_subtitle_text_file,
+    parse_vtt_content,
+)
+
+
+def test_srt_empty_cue_does_not_swallow_next_cue():
+    content = (
+        "1\n00:00:01,000 --> 00:00:02,000\n\n"
+        "2\n00:00:03,000 --> 00:00:04,000\nSecond\n"
+    )
+
+    assert parse_srt_content(content) == [
+        {"number": 2, "start_time": 3000, "end_time": 4000, "text": "Second"}
+    ]
+
+
+def test_srt_digit_only_lines_stay_in_cue_text():
+    content = (
+        "1\n00:00:01,000 --> 00:00:02,000\nCount down\n3\n2\n1\n\n"
+        "2\n00:00:03,000 --> 00:00:04,000\nThe answer is\n42"
+    )
+
+    assert parse_srt_content(content) == [
+        {"number": 1, "start_time": 1000, "end_time": 2000, "text": "Count down 3 2 1"},
+        {"number": 2, "start_time": 3000, "end_time": 4000, "text": "The answer is 42"},
+    ]
+
+
+def test_srt_crlf_line_endings():
+    content = (
+        "1\r\n00:00:01,000 --> 00:00:02,500\r\nFirst line\r\nsecond line\r\n\r\n"
+        "2\r\n00:00:03,000 --> 00:00:04,000\r\nNext\r\n"
+    )
+
+    assert parse_srt_content(content) == [
+        {
+            "number": 1,
+            "start_time": 1000,
+            "end_time": 2500,
+            "text": "First line second line",
+        },
+        {"number": 2, "start_time": 3000, "end_time": 4000, "text": "Next"},
+    ]
+
+
+def test_srt_tags_are_stripped():
+    content = (
+        "1\n00:00:01,000 --> 00:00:02,000\n"
+        "<i>Stay</i> <font color=\"red\">back</font>\n"
+    )
+
+    assert parse_srt_content(content) == [
+        {"number": 1, "start_time": 1000, "end_time": 2000, "text": "Stay back"}
+    ]
+
+
+def test_srt_file_with_utf8_bom(tmp_path):
+    path = tmp_path / "movie.srt"
+    path.write_bytes(
+        "\ufeff1\n00:00:01,000 --> 00:00:02,000\nCafé\n".encode("utf-8")
+    )
+
+    assert asyncio.run(parse_subtitle_text_file(str(path))) == [
+        {"number": 1, "start_time": 1000, "end_time": 2000, "text": "Café"}
+    ]
+
+
+def test_vtt_cue_settings_notes_and_identifiers():
+    content = (
+        "WEBVTT\n\n"
+        "NOTE this block\nis a comment\n\n"
+        "intro\n"
+        "00:00:01.000 --> 00:00:02.000 align:start position:10%\n"
+        "<v Bob>Hello</v>\n\n"
+        "00:01:02.345 --> 01:00:00.000\nBye\n"
+    )
+
+    assert parse_vtt_content(content) == [
+        {"number": 1, "start_time": 1000, "end_time": 2000, "text": "Hello"},
+        {"number": 2, "start_time": 62345, "end_time": 3600000, "text": "Bye"},
+    ]
+
+
+def test_vtt_file_with_utf8_bom(tmp_path):
+    path = tmp_path / "movie.vtt"
+    path.write_bytes(
+        "\ufeffWEBVTT\n\n00:00:01.000 --> 00:00:02.000\nHi\n".encode("utf-8")
+    )
+
+    assert asyncio.run(parse_subtitle_text_file(str(path))) == [
+        {"number": 1, "start_time": 1000, "end_time": 2000, "text": "Hi"}
+    ]
+
+
+def test_convert_timestamp_to_ms():
+    assert convert_timestamp_to_ms("00:00:00,000") == 0
+    assert convert_timestamp_to_ms("00:00:01,001") == 1001
+    assert convert_timestamp_to_ms("01:02:03.456") == 3723456
+    assert convert_timestamp_to_ms("99:59:59,999") == 359999999
@@ -0,0 +1,9 @@
+import datetime
+
+from app.worker import _ms_to_time
+
+
+def test_ms_to_time():
+    assert _ms_to_time(0) == datetime.time(0, 0, 0)
+    assert _ms_to_time(1001) == datetime.time(0, 0, 1, 1000)
+    assert _ms_to_time(3723456) == datetime.time(1, 2, 3, 456000)